@@ -1,7 +1,16 @@
 import os
+import io
+import csv
 import logging
+from urllib.parse import parse_qsl, urlparse
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, regexp_extract, to_date, from_unixtime
+from pyspark.sql.functions import (
+    col, instr, length, lit, substring_index, to_date, from_unixtime
+)
+from pyspark.sql.types import (
+    DoubleType, IntegerType, StringType, StructField, StructType
+)
 from pyspark.sql.utils import AnalysisException
 
 
@@ -13,6 +22,35 @@ except ImportError:
     exit(1)  # Exit the script to prevent further errors
 
 
+# Schema of the CSV produced by generate_user_data.py
+USER_SCHEMA = StructType([
+    StructField("user_id", IntegerType()),
+    StructField("name", StringType()),
+    StructField("email", StringType()),
+    StructField("signup_date", DoubleType()),  # Unix timestamp
+])
+
+JDBC_BATCH_SIZE = 50_000  # Rows per JDBC batch insert
+WRITE_PARTITIONS = 8  # Concurrent database connections, ~2x the database cores
+COPY_FLUSH_ROWS = 50_000  # Rows buffered in memory per COPY statement
+PARQUET_BLOCK_SIZE = 128 * 1024 * 1024  # Row group size, 128 MiB
+
+SINKS = ("postgresql", "parquet")
+LOAD_METHODS = ("copy", "jdbc")
+
+# JDBC URL parameters with a libpq equivalent, other parameters are ignored by the COPY path
+JDBC_TO_LIBPQ_PARAMS = {
+    "user": "user",
+    "password": "password",
+    "sslmode": "sslmode",
+    "sslrootcert": "sslrootcert",
+    "sslcert": "sslcert",
+    "sslkey": "sslkey",
+    "connectTimeout": "connect_timeout",
+    "ApplicationName": "application_name",
+}
+
+
 def get_postgres_password(secret_path: str) -> str:
     """Securely read PostgreSQL password from Docker Secret."""
     try:
@@ -33,12 +71,20 @@ def setup_logging() -> logging.Logger:
     return logging.getLogger(__name__)
 
 
-def extract_data(spark: SparkSession, input_file: str) -> 'DataFrame':
-    """Extract data from a CSV file and load it into a Spark DataFrame."""
+def extract_data(spark: SparkSession, input_file: str,
+                 schema: StructType = USER_SCHEMA) -> 'DataFrame':
+    """Extract data from a CSV or Parquet file and load it into a Spark DataFrame."""
     try:
-        df = spark.read.csv(input_file, header=True, inferSchema=False)
-        logging.info(f"Successfully loaded {input_file} into a DataFrame.")
-        
+        if input_file.endswith(".parquet"):
+            # Parquet files carry their own column types
+            df = spark.read.parquet(input_file)
+        else:
+            # An explicit schema lets the CSV parser apply pushed-down filters per row and
+            # skip converting the remaining tokens of rows that are going to be rejected.
+            # Only simple predicates are pushed, see the email filter in transform_data.
+            df = spark.read \
+                .option("mode", "DROPMALFORMED") \
+                .csv(input_file, header=True, schema=schema)
     except Exception as e:
         logging.error(f"Error loading data from {input_file}: {e}")
         raise
@@ -49,10 +95,25 @@ def extract_data(spark: SparkSession, input_file: str) -> 'DataFrame':
 def transform_data(df: 'DataFrame') -> 'DataFrame':
     """Transform the data: format signup_date, filter invalid emails, and extract domain."""
     try:
-        df = df.filter(col("email").rlike(r"^[^@]+@[^@]+\.[^@]+$")) \
-            .withColumn("signup_date", to_date(from_unixtime(col("signup_date")))) \
-            .withColumn("domain", regexp_extract(col("email"), r'@([A-Za-z0-9.-]+)', 1)) \
-            .withColumn("user_id", col("user_id").cast("int"))
+        # Equivalent to rlike(r"^[^@]+@[^@]+\.[^@]+$") but built from plain string scans:
+        # a non-empty local part, exactly one '@', and a '.' inside the domain.
+        email = col("email")
+        local_part = substring_index(email, "@", 1)
+        domain = substring_index(email, "@", -1)
+        # contains("@") is redundant with the instr check, but unlike the other conjuncts it
+        # is pushed down to the CSV reader as StringContains(email, @).
+        is_valid_email = email.contains("@") \
+            & (instr(email, "@") > 1) \
+            & (length(local_part) + length(domain) + 1 == length(email)) \
+            & domain.substr(lit(2), length(domain) - 2).contains(".")
+
+        df = df.filter(is_valid_email).select(
+            col("user_id"),  # Already parsed as an integer by the reader schema
+            col("name"),
+            col("email"),
+            to_date(from_unixtime(col("signup_date"))).alias("signup_date"),
+            domain.alias("domain")
+        )
     except AnalysisException as e:
         logging.error(f"Error during data transformation: {e}")
         raise
@@ -60,15 +121,23 @@ def transform_data(df: 'DataFrame') -> 'DataFrame':
 
 
 def load_data_to_postgresql(df: 'DataFrame', jdbc_url: str, table_name: str,
-                            username: str, password: str) -> None:
+                            username: str, password: str,
+                            num_partitions: int = WRITE_PARTITIONS) -> None:
     """Load the transformed data into a PostgreSQL database."""
+    # Let the PostgreSQL driver rewrite each batch into multi-row INSERT statements
+    if "reWriteBatchedInserts" not in jdbc_url:
+        jdbc_url += ("&" if "?" in jdbc_url else "?") + "reWriteBatchedInserts=true"
+
     try:
         df.write.format("jdbc").options(
             url=jdbc_url,
             driver="org.postgresql.Driver",
             dbtable=table_name,
             user=username,
-            password=password
+            password=password,
+            batchsize=str(JDBC_BATCH_SIZE),
+            isolationLevel="NONE",  # Bulk load, no need for transactional isolation
+            numPartitions=str(num_partitions)
         ).mode('append').save()  # 'overwrite' or 'append'
         logging.info(f"Successfully loaded data into {table_name}.")
     except Exception as e:
@@ -76,22 +145,151 @@ def load_data_to_postgresql(df: 'DataFrame', jdbc_url: str, table_name: str,
         raise
 
 
+def parse_jdbc_url(jdbc_url: str) -> dict:
+    """Extract psycopg2 connection parameters from a PostgreSQL JDBC URL."""
+    if not jdbc_url or not jdbc_url.startswith("jdbc:postgresql:"):
+        raise ValueError(f"Unsupported JDBC URL '{jdbc_url}', expected jdbc:postgresql:...")
+
+    url = urlparse(jdbc_url[len("jdbc:"):])
+    if "," in url.netloc:
+        raise ValueError("Multi-host JDBC URLs are not supported by the COPY load method, "
+                         "use LOAD_METHOD=jdbc instead.")
+    try:
+        port = url.port or 5432
+    except ValueError:
+        raise ValueError(f"Invalid port in JDBC URL '{jdbc_url}'")
+
+    # Like the JDBC driver, connect over TCP to localhost when the URL has no host
+    conn_params = {
+        "host": url.hostname or "localhost",
+        "port": port,
+        "dbname": url.path.lstrip("/"),
+    }
+
+    url_params = dict(parse_qsl(url.query))
+    for jdbc_name, libpq_name in JDBC_TO_LIBPQ_PARAMS.items():
+        if jdbc_name in url_params:
+            conn_params[libpq_name] = url_params[jdbc_name]
+
+    # Like the PostgreSQL JDBC driver, ssl=true without an sslmode verifies the server
+    if url_params.get("ssl", "").lower() == "true" and "sslmode" not in conn_params:
+        conn_params["sslmode"] = "verify-full"
+    if "currentSchema" in url_params:
+        conn_params["options"] = f"-c search_path={url_params['currentSchema']}"
+
+    return conn_params
+
+
+def copy_data_to_postgresql(df: 'DataFrame', jdbc_url: str, table_name: str,
+                            username: str, password: str) -> None:
+    """Bulk load the transformed data into PostgreSQL with COPY, one connection per partition."""
+    # Credentials given in the URL take precedence, as they do for the JDBC driver
+    conn_params = {"user": username, "password": password, **parse_jdbc_url(jdbc_url)}
+    copy_sql = f"COPY {table_name} ({', '.join(df.columns)}) FROM STDIN WITH CSV"
+
+    def copy_partition(rows) -> None:
+        # Imported on the executor, the driver never needs psycopg2
+        import psycopg2
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        conn = psycopg2.connect(**conn_params)
+        try:
+            with conn, conn.cursor() as cursor:
+                def flush() -> None:
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_sql, buffer)
+                    buffer.seek(0)
+                    buffer.truncate()
+
+                buffered_rows = 0
+                for row in rows:
+                    writer.writerow(row)
+                    buffered_rows += 1
+                    if buffered_rows == COPY_FLUSH_ROWS:
+                        flush()
+                        buffered_rows = 0
+
+                if buffered_rows:
+                    flush()
+        finally:
+            conn.close()
+
+    try:
+        df.foreachPartition(copy_partition)
+        logging.info(f"Successfully copied data into {table_name}.")
+    except Exception as e:
+        logging.error(f"Error copying data to PostgreSQL: {e}")
+        raise
+
+
+def write_data_to_parquet(df: 'DataFrame', output_path: str) -> None:
+    """Write the transformed data as Parquet, partitioned by email domain."""
+    try:
+        # Partition directories allow pruning by domain, while the row group statistics
+        # of dictionary-encoded columns allow readers to skip data on other predicates.
+        df.write \
+            .option("parquet.enable.dictionary", "true") \
+            .option("parquet.block.size", str(PARQUET_BLOCK_SIZE)) \
+            .partitionBy("domain") \
+            .mode('append') \
+            .parquet(output_path)
+        logging.info(f"Successfully wrote data to {output_path}.")
+    except Exception as e:
+        logging.error(f"Error writing data to Parquet: {e}")
+        raise
+
+
 def etl_pipeline(input_file: str, jdbc_url: str, table_name: str, username: str,
-                 password: str) -> None:
+                 password: str, load_method: str = "copy", sink: str = "postgresql",
+                 parquet_path: str = None, write_partitions: int = WRITE_PARTITIONS) -> None:
     """Run the ETL pipeline: extract, transform, and load the data."""
+    # Validate the sink settings before any data is read
+    if sink not in SINKS:
+        raise ValueError(f"Unknown sink '{sink}', expected one of: {', '.join(SINKS)}")
+    if load_method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method '{load_method}', "
+                         f"expected one of: {', '.join(LOAD_METHODS)}")
+    if sink == "parquet" and not parquet_path:
+        raise ValueError("PARQUET_PATH must be set when writing to the Parquet sink.")
+    if sink == "postgresql" and load_method == "copy":
+        parse_jdbc_url(jdbc_url)  # Raises for URL forms the COPY path cannot connect with
+
     spark = SparkSession.builder \
         .appName("ETL Pipeline") \
         .config("spark.jars", "/opt/spark/jars/postgresql-42.2.24.jar") \
+        .config("spark.sql.csv.filterPushdown.enabled", "true") \
+        .config("spark.sql.files.maxPartitionBytes", "256m") \
+        .config("spark.sql.adaptive.enabled", "true") \
+        .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
         .getOrCreate()
 
-    # Extract: Load data from CSV
+    # Extract: Load data from CSV or Parquet
     df = extract_data(spark, input_file)
 
-    # Transform
-    df = transform_data(df)
+    # Transform. DataFrames are lazy, so every action re-reads and re-parses the CSV;
+    # persist the result because it is used by both the count and the write below.
+    # For PostgreSQL, hash partitioning on user_id gives every writer task roughly the same
+    # number of rows. For Parquet, partitioning on domain keeps each domain directory to a
+    # single file instead of one file per writer task.
+    partition_column = col("domain") if sink == "parquet" else col("user_id")
+    df = transform_data(df) \
+        .repartition(write_partitions, partition_column) \
+        .persist(StorageLevel.MEMORY_AND_DISK)
+    logging.info(f"Transformed {df.count()} valid records from {input_file}.")
 
-    # Load
-    load_data_to_postgresql(df, jdbc_url, table_name, username, password)
+    # Load: Parquet is the fast lane for analytics consumers. For PostgreSQL, COPY is the
+    # fast bulk path and JDBC batch inserts are kept as a fallback.
+    if sink == "parquet":
+        write_data_to_parquet(df, parquet_path)
+    elif load_method == "jdbc":
+        load_data_to_postgresql(df, jdbc_url, table_name, username, password,
+                                write_partitions)
+    elif load_method == "copy":
+        copy_data_to_postgresql(df, jdbc_url, table_name, username, password)
+    df.unpersist()
 
     print("ETL process completed successfully.")
     spark.stop()
@@ -108,12 +306,17 @@ if __name__ == "__main__":
     POSTGRES_TABLE: str = os.getenv("POSTGRES_TABLE")
     SECRET_PATH: str = os.getenv("SECRET_POSTGRES_PASSWORD_PATH")
     POSTGRES_PASSWORD: str = get_postgres_password(SECRET_PATH)
+    LOAD_METHOD: str = os.getenv("LOAD_METHOD", "copy")  # 'copy' or 'jdbc'
+    SINK: str = os.getenv("SINK", "postgresql")  # 'postgresql' or 'parquet'
+    PARQUET_PATH: str = os.getenv("PARQUET_PATH")
+    NUM_WRITE_PARTITIONS: int = int(os.getenv("WRITE_PARTITIONS", WRITE_PARTITIONS))
 
     print(f"Connecting to DB {POSTGRES_TABLE} as {POSTGRES_USER}")  # Debugging (hides password)
 
-    input_file: str = "data.csv"
+    input_file: str = os.getenv("INPUT_FILE", "data.csv")
 
     try:
-        etl_pipeline(input_file, JDBC_URL, POSTGRES_TABLE, POSTGRES_USER, POSTGRES_PASSWORD)
+        etl_pipeline(input_file, JDBC_URL, POSTGRES_TABLE, POSTGRES_USER, POSTGRES_PASSWORD,
+                     LOAD_METHOD, SINK, PARQUET_PATH, NUM_WRITE_PARTITIONS)
     except Exception as e:
         logger.error(f"ETL process failed: {e}")
@@ -1,25 +1,31 @@
 """
-This script generates fake user data and saves it to a CSV file.
+This script generates fake user data and saves it to a CSV or Parquet file.
 
 Usage:
-    python generate_fake_user_data.py <csv_filename> <num_records> [--start_date=<start_date>] [--end_date=<end_date>] [--locale <locale> ...]
+    python generate_fake_user_data.py <output_filename> <num_records> [--start_date=<start_date>] [--end_date=<end_date>] [--locale <locale> ...] [--seed <seed>] [--force] [--format <format>]
 
 Arguments:
-    <csv_filename>  Name of the output CSV file.
-    <num_records>   Number of records to generate.
+    <output_filename>  Name of the output file.
+    <num_records>      Number of records to generate.
 
 Optional Arguments:
     --start_date    Start date for generating signup dates (e.g., '-5y', '-1y'). Default is '-5y'.
     --end_date      End date for generating signup dates (e.g., 'now', '-1m'). Default is 'now'.
     --locale        List of locales for generating fake data (e.g., 'en_US', 'fr_FR'). Default is 'en_US'.
+    --seed          Seed for reproducible names and emails. Default is a random seed.
+                    Signup dates stay relative to the current time, so they differ between runs.
+    --force         Overwrite the output file if it already exists, without asking.
+    --format        Output file format, 'csv' or 'parquet'. Default is 'csv'.
 
 Example usage:
     python generate_user_data.py data.csv 1000 --start_date="-1y" --locale en_US fr_FR
 """
 import os
 import argparse
-import csv
-from typing import List, Tuple
+import multiprocessing
+import secrets
+import sys
+from typing import BinaryIO, List, Optional, Tuple
 
 # Try to import tqdm for progress bar
 try:
@@ -30,87 +36,295 @@ except ImportError:
 
 try:
     import faker
+    from faker.providers.date_time import Provider as DateTimeProvider
 except ImportError:
     print("Error: The 'Faker' library is required but not installed.")
     print("You can install it by running: pip install Faker==35.2.0")
     exit(1)  # Exit the script to prevent further errors
 
+try:
+    import numpy as np
+except ImportError:
+    print("Error: The 'numpy' library is required but not installed.")
+    print("You can install it by running: pip install numpy")
+    exit(1)  # Exit the script to prevent further errors
 
-def create_fake_user_data(fake: faker.Faker, start_date: str,
-                          end_date: str) -> Tuple[str, str, float]:
-    """Generate fake user data."""
-    name: str = fake.name()
-    email: str = fake.unique.ascii_free_email()
-    signup_date: float = fake.date_time_between(
-        start_date=start_date,
-        end_date=end_date
-    ).timestamp()
+# Try to import pyarrow, only required for Parquet output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    USE_PYARROW = True
 
-    if signup_date is None:
-        signup_date = 0
+    PARQUET_SCHEMA = pa.schema([
+        ("user_id", pa.int32()),
+        ("name", pa.string()),
+        ("email", pa.string()),
+        ("signup_date", pa.int64()),  # Unix timestamp
+    ])
+except ImportError:
+    USE_PYARROW = False
 
-    return name, email, signup_date
 
+BATCH_SIZE = 10_000  # Number of rows generated and written at once
+WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB file buffer
+PARQUET_ROW_GROUP_SIZE = 1_000_000  # Rows per Parquet row group
+NAME_POOL_SIZE = 100_000  # Maximum number of distinct names generated per run
+NAME_POOL_RATIO = 10  # Records per pre-generated name, keeps the pool well below num_records
+NAME_POOL_MIN_SIZE = 1_000  # Keeps small datasets varied despite NAME_POOL_RATIO
+DOMAIN_POOL_SIZE = 1_000  # Free email providers repeat after a few dozen values anyway
 
-def write_to_csv(csv_filename: str, num_records: int, fake: faker.Faker, start_date: str,
-                 end_date: str) -> None:
-    """Write fake data to the CSV file."""
-    try:
-        with open(csv_filename, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(["user_id", "name", "email", "signup_date"])
+# Per-process state of pool workers, set up once by _init_worker
+_FAKE: Optional[faker.Faker] = None
+_SEED: int = 0
+
+# Pools of pre-generated values shared by all workers, sampled with replacement
+_NAME_POOL: List[str] = []
+_DOMAIN_POOL: List[str] = []
+
+
+def create_value_pools(fake: faker.Faker, name_pool_size: int) -> Tuple[List[str], List[str]]:
+    """Generate the name and email domain pools, once per run in the parent process."""
+    name_pool = [fake.name() for _ in range(name_pool_size)]
+    domain_pool = [fake.free_email_domain() for _ in range(DOMAIN_POOL_SIZE)]
+    return name_pool, domain_pool
+
+
+def seed_faker(fake: faker.Faker, seed: int) -> None:
+    """Seed every random source Faker draws from."""
+    fake.seed_instance(seed)
+    # Seeds faker.generator.random, the Random shared by all Faker instances, which
+    # multi-locale Faker also uses to pick the locale of each call
+    faker.Faker.seed(seed)
+
+
+def create_fake_email(fake: faker.Faker, user_id: int, domain: str) -> str:
+    """Generate a fake email address."""
+    # Embedding the user_id keeps emails unique without tracking every generated value
+    return f"{fake.user_name()}.{user_id}@{domain}"
 
-            # Determine the iterator for records, with progress tracking if tqdm is available
-            record_iterator = range(1, num_records + 1)
 
-            if USE_TQDM:
-                record_iterator = tqdm(record_iterator)
-            else:
-                # Calculate 10% progress threshold
-                progress_threshold = num_records // 10
+def _init_worker(locale: List[str], name_pool: List[str], domain_pool: List[str],
+                 seed: int) -> None:
+    """Create the worker's Faker instance and store the value pools, before any batch runs."""
+    global _FAKE, _SEED, _NAME_POOL, _DOMAIN_POOL
+    _FAKE = faker.Faker(locale=locale)
+    _SEED = seed
+    _NAME_POOL = name_pool
+    _DOMAIN_POOL = domain_pool
+
+    # A first user_name() call loads the lazily imported locale data, so batches never
+    # pay that cold start
+    seed_faker(_FAKE, seed)
+    _FAKE.user_name()
+
+
+def _gen_batch(args: Tuple[int, int, int, int]) -> List[Tuple[int, str, str, int]]:
+    """Generate a batch of fake user rows in a worker process."""
+    start_timestamp, end_timestamp, first_user_id, count = args
+
+    # Seeding by the run seed and the first user_id makes each batch reproducible no matter
+    # which worker generates it, and keeps forked workers from sharing the parent's random
+    # state. SeedSequence mixes both values, so different run seeds never share batches.
+    seed_sequence = np.random.SeedSequence([_SEED, first_user_id])
+    seed_faker(_FAKE, int(seed_sequence.generate_state(1)[0]))
+    rng = np.random.default_rng(seed_sequence)
+
+    # Draw names, domains and signup timestamps of the batch in vectorized calls
+    names = [_NAME_POOL[i] for i in rng.integers(len(_NAME_POOL), size=count)]
+    domains = [_DOMAIN_POOL[i] for i in rng.integers(len(_DOMAIN_POOL), size=count)]
+    signup_dates = rng.integers(
+        start_timestamp, end_timestamp, size=count, endpoint=True
+    ).tolist()
+
+    return [
+        (user_id, name, create_fake_email(_FAKE, user_id, domain), signup_date)
+        for user_id, name, domain, signup_date in zip(
+            range(first_user_id, first_user_id + count), names, domains, signup_dates
+        )
+    ]
+
+
+def encode_csv_rows(rows: List[Tuple[int, str, str, int]]) -> bytes:
+    """Encode rows as CSV lines, skipping the csv module's per-field quoting checks."""
+    # All fields are generated here: ids and timestamps are integers and emails contain
+    # no commas, so only names need to be made safe for an unquoted CSV field.
+    buffer = bytearray()
+    for user_id, name, email, signup_date in rows:
+        buffer += f"{user_id},{name.replace(',', ' ')},{email},{signup_date}\n".encode()
+    return bytes(buffer)
+
+
+def _gen_csv_batch(args: Tuple[int, int, int, int]) -> bytes:
+    """Generate a batch of fake user rows in a worker process, encoded as CSV."""
+    return encode_csv_rows(_gen_batch(args))
+
+
+def _gen_parquet_batch(args: Tuple[int, int, int, int]) -> 'pa.RecordBatch':
+    """Generate a batch of fake user rows in a worker process, as an Arrow record batch."""
+    columns = zip(*_gen_batch(args))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, PARQUET_SCHEMA)],
+        schema=PARQUET_SCHEMA
+    )
 
-            for user_id in record_iterator:
-                # Print progress every 10% if tqdm is not used
-                if not USE_TQDM and user_id % progress_threshold == 0:
-                    print(f"Generated {user_id}/{num_records} records...")
 
-                name, email, signup_date = create_fake_user_data(fake, start_date, end_date)
-                writer.writerow([user_id, name, email, signup_date])
+def _write_batches(file: BinaryIO, pool: 'multiprocessing.pool.Pool',
+                   batch_args: List[Tuple[int, int, int, int]], num_records: int,
+                   output_format: str) -> None:
+    """Generate batches in the worker pool and write them to the output file in order."""
+    if output_format == "parquet":
+        # Columnar, dictionary-encoded and compressed. Batches are accumulated into
+        # large row groups so their statistics let readers skip data effectively.
+        parquet_writer = pq.ParquetWriter(file, PARQUET_SCHEMA, compression="snappy")
+        pending_batches: List['pa.RecordBatch'] = []
 
-        print(f"CSV file '{csv_filename}' generated with {num_records} records.")
+        def flush_row_group() -> None:
+            if pending_batches:
+                parquet_writer.write_table(
+                    pa.Table.from_batches(pending_batches),
+                    row_group_size=PARQUET_ROW_GROUP_SIZE
+                )
+                pending_batches.clear()
+
+        def write_batch(batch: 'pa.RecordBatch') -> None:
+            pending_batches.append(batch)
+            if sum(b.num_rows for b in pending_batches) >= PARQUET_ROW_GROUP_SIZE:
+                flush_row_group()
+
+        gen_batch = _gen_parquet_batch
+    else:
+        file.write(b"user_id,name,email,signup_date\n")
+        gen_batch, write_batch = _gen_csv_batch, file.write
+
+    # Track progress with tqdm if available, otherwise print every 10%
+    if USE_TQDM:
+        progress_bar = tqdm(total=num_records)
+    else:
+        progress_threshold = max(num_records // 10, 1)
+        next_report = progress_threshold
+
+    generated = 0
+    # imap keeps batches in user_id order while the main process only writes
+    batches = pool.imap(gen_batch, batch_args, chunksize=1)
+    for (*_, count), batch in zip(batch_args, batches):
+        write_batch(batch)
+        generated += count
+
+        if USE_TQDM:
+            progress_bar.update(count)
+        elif generated >= next_report:
+            print(f"Generated {generated}/{num_records} records...")
+            next_report = (generated // progress_threshold + 1) * progress_threshold
+
+    if USE_TQDM:
+        progress_bar.close()
+    if output_format == "parquet":
+        flush_row_group()
+        parquet_writer.close()
+
+
+def write_user_data(output_filename: str, num_records: int, locale: List[str],
+                    start_date: str, end_date: str, seed: Optional[int] = None,
+                    force: bool = False, output_format: str = "csv") -> None:
+    """Write fake data to the output file, generating batches in parallel worker processes."""
+    # Resolve relative dates such as '-5y' to Unix timestamps once
+    start_timestamp: int = DateTimeProvider._parse_date_time(start_date)
+    end_timestamp: int = DateTimeProvider._parse_date_time(end_date)
+    if start_timestamp > end_timestamp:
+        raise ValueError(f"start_date '{start_date}' is after end_date '{end_date}'")
+
+    if seed is None:
+        seed = secrets.randbits(32)
+    elif seed < 0:
+        raise ValueError(f"seed must be a non-negative integer, got {seed}")
+
+    # Each task covers a contiguous range of user ids
+    batch_args = [
+        (start_timestamp, end_timestamp, first_user_id,
+         min(BATCH_SIZE, num_records - first_user_id + 1))
+        for first_user_id in range(1, num_records + 1, BATCH_SIZE)
+    ]
+    # No point in starting workers that would never get a batch
+    processes = max(min(os.cpu_count() or 1, len(batch_args)), 1)
+
+    try:
+        # Check the output file before doing any work
+        file = open_output_file(output_filename, force)
+        if file is None:
+            return
+
+        try:
+            with file:
+                # Generate the value pools once here rather than in every worker
+                fake = faker.Faker(locale=locale)
+                seed_faker(fake, seed)
+                name_pool_size = min(NAME_POOL_SIZE, num_records,
+                                     max(num_records // NAME_POOL_RATIO, NAME_POOL_MIN_SIZE))
+                name_pool, domain_pool = create_value_pools(fake, name_pool_size)
+
+                with multiprocessing.Pool(processes, initializer=_init_worker,
+                                          initargs=(locale, name_pool, domain_pool, seed)) as pool:
+                    _write_batches(file, pool, batch_args, num_records, output_format)
+        except BaseException:
+            # Don't leave a partial file behind, O_EXCL would refuse every rerun
+            os.remove(output_filename)
+            raise
+
+        print(f"{output_format.upper()} file '{output_filename}' generated with "
+              f"{num_records} records.")
     except IOError as e:
-        print(f"IO error writing to file {csv_filename}: {e}")
+        print(f"IO error writing to file {output_filename}: {e}")
     except ValueError as e:
         print(f"Value error in data: {e}")
 
 
-def check_and_confirm_file_overwrite(csv_filename: str) -> bool:
-    """Check if the file exists and ask user for confirmation to overwrite it."""
-    if os.path.exists(csv_filename):
-        # Ask user for confirmation to overwrite the file
-        confirm = input(
-            f"The file '{csv_filename}' already exists. Do you want to overwrite it? (y/n): "
-        ).strip().lower()
-        if confirm != 'y':
-            print("File creation aborted.")
-            return False  # Return False if user doesn't want to overwrite
-    return True  # Return True if file doesn't exist or user confirms overwrite
+def confirm_file_overwrite(output_filename: str) -> bool:
+    """Ask user for confirmation to overwrite an existing file."""
+    confirm = input(
+        f"The file '{output_filename}' already exists. Do you want to overwrite it? (y/n): "
+    ).strip().lower()
+    if confirm != 'y':
+        print("File creation aborted.")
+        return False  # Return False if user doesn't want to overwrite
+    return True  # Return True if user confirms overwrite
+
+
+def open_output_file(output_filename: str, force: bool) -> Optional[BinaryIO]:
+    """Open the output file, refusing to replace an existing file unless allowed to."""
+    # O_EXCL makes the existence check and the file creation a single atomic operation
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    try:
+        fd = os.open(output_filename, flags if force else flags | os.O_EXCL, 0o644)
+    except FileExistsError:
+        # Only ask when someone can answer, e.g. not in CI or a container
+        if not sys.stdin.isatty():
+            print(f"The file '{output_filename}' already exists. Use --force to overwrite it.")
+            return None
+        if not confirm_file_overwrite(output_filename):
+            return None
+        fd = os.open(output_filename, flags, 0o644)
+
+    return os.fdopen(fd, mode='wb', buffering=WRITE_BUFFER_SIZE)
 
 
-def generate_fake_user_csv(csv_filename: str, num_records: int, start_date: str,
-                           end_date: str, locale: List[str]) -> None:
-    """Main function to initialize Faker and call writing logic."""
-    fake = faker.Faker(locale=locale)
-    if check_and_confirm_file_overwrite(csv_filename):
-        write_to_csv(csv_filename, num_records, fake, start_date, end_date)
+def generate_fake_user_data(output_filename: str, num_records: int, start_date: str,
+                            end_date: str, locale: List[str], seed: Optional[int] = None,
+                            force: bool = False, output_format: str = "csv") -> None:
+    """Main function to check the output format and call writing logic."""
+    if output_format == "parquet" and not USE_PYARROW:
+        print("Error: The 'pyarrow' library is required for Parquet output but not installed.")
+        print("You can install it by running: pip install pyarrow")
+        return
+    write_user_data(output_filename, num_records, locale, start_date, end_date, seed, force,
+                    output_format)
 
 
 if __name__ == "__main__":
     parser: argparse.ArgumentParser = argparse.ArgumentParser(
-        description="Generate a CSV file with fake user data."
+        description="Generate a CSV or Parquet file with fake user data."
     )
     parser.add_argument(
-        "csv_filename", type=str, help="Name of the output CSV file."
+        "output_filename", type=str, help="Name of the output file."
     )
     parser.add_argument(
         "num_records", type=int, help="Number of records to generate."
@@ -127,12 +341,26 @@ if __name__ == "__main__":
         "--locale", type=str, nargs='+', default=["en_US"],
         help="Locales for generating fake data (e.g., 'en_US', 'fr_FR')."
     )
+    parser.add_argument(
+        "--seed", type=int, default=None,
+        help="Seed for reproducible names and emails (default: random). Signup dates "
+             "are relative to the current time and differ between runs."
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Overwrite the output file if it already exists."
+    )
+    parser.add_argument(
+        "--format", type=str, choices=["csv", "parquet"], default="csv",
+        help="Output file format (default: csv)."
+    )
 
     args: argparse.Namespace = parser.parse_args()
 
     try:
-        generate_fake_user_csv(args.csv_filename, args.num_records, args.start_date,
-                               args.end_date, args.locale)
+        generate_fake_user_data(args.output_filename, args.num_records, args.start_date,
+                                args.end_date, args.locale, args.seed, args.force,
+                                args.format)
     except ValueError as e:
         print(f"Argument error: {e}")
     except Exception as e: